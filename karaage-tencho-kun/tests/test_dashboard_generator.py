@@ -141,6 +141,24 @@ class TestDashboardGenerator(unittest.TestCase):
         result = messages[0]
         self.assertEqual(result["report_type"], "daily")
 
+    def test_repeated_invocations_reuse_cached_aggregates(self) -> None:
+        tool = self._make_tool()
+        calls = []
+        build = tool._get_daily_data
+        tool._get_daily_data = lambda conn, now: calls.append(now) or build(conn, now)
+
+        first = list(tool._invoke({"report_type": "daily"}))[0]
+        second = list(tool._invoke({"report_type": "daily"}))[0]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(first["kpi"], second["kpi"])
+
+        # 売上データが変わったら再集計する
+        sa._db.get_connection().execute("INSERT INTO sales SELECT * FROM sales LIMIT 1")
+        list(tool._invoke({"report_type": "daily"}))
+
+        self.assertEqual(len(calls), 2)
+
     def test_calc_change_positive(self) -> None:
         tool = self._make_tool()
         change = tool._calc_change(110, 100)
@@ -22,6 +22,11 @@ class TestDatetimeUtils(unittest.TestCase):
             datetime_utils.to_jst(dt).isoformat(), "2026-02-15T09:00:00+09:00"
         )
 
+    def test_parse_hour_handles_padded_and_unpadded_hours(self) -> None:
+        self.assertEqual(datetime_utils.parse_hour("09:30"), 9)
+        self.assertEqual(datetime_utils.parse_hour("24:00"), 24)
+        self.assertEqual(datetime_utils.parse_hour("9:30"), 9)
+
     def test_invoke_converts_offset_input_to_jst(self) -> None:
         tool = object.__new__(datetime_utils.DatetimeUtilsTool)
         tool.create_json_message = lambda body: body
@@ -1,6 +1,7 @@
 import sys
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 PLUGIN_ROOT = Path(__file__).resolve().parents[1]
 if str(PLUGIN_ROOT) not in sys.path:
@@ -55,6 +56,156 @@ class TestSalesAnalytics(unittest.TestCase):
         self.assertIsInstance(rows, list)
         self.assertEqual(rows[0]["c"], 29)
 
+    def test_invoke_reuses_cached_result_for_same_sql(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+        sql = "SELECT COUNT(*) AS c FROM items"
+
+        first = list(tool._invoke({"sql": sql}))[0]
+        with patch.object(sa, "fetch_records") as fetch:
+            second = list(tool._invoke({"sql": sql}))[0]
+
+        fetch.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_cached_result_is_not_shared_with_callers(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+        sql = "SELECT COUNT(*) AS c FROM items"
+
+        first = list(tool._invoke({"sql": sql}))[0]
+        first[0]["c"] = -1
+        first.append({"c": -2})
+        second = list(tool._invoke({"sql": sql}))[0]
+
+        self.assertEqual(second, [{"c": 29}])
+
+    def test_volatile_queries_are_not_cached(self) -> None:
+        conn = sa._db.get_connection()
+
+        for sql in ("SELECT NOW() AS t", "SELECT random() AS r", "SELECT current_timestamp AS t"):
+            with self.subTest(sql=sql):
+                sa._get_cached_records(conn, sql)
+
+                self.assertNotIn(sql, sa._result_cache)
+
+    def test_cached_result_is_dropped_after_reset(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+        sql = "SELECT COUNT(*) AS c FROM items"
+
+        first = list(tool._invoke({"sql": sql}))[0]
+        sa._db.reset()
+        with patch.object(sa, "fetch_records", wraps=sa.fetch_records) as fetch:
+            second = list(tool._invoke({"sql": sql}))[0]
+
+        fetch.assert_called_once()
+        self.assertEqual(first, second)
+
+    def test_expired_results_are_dropped_when_storing(self) -> None:
+        conn = sa._db.get_connection()
+
+        with patch.object(sa, "_monotonic", return_value=1000.0):
+            sa._get_cached_records(conn, "SELECT COUNT(*) AS c FROM items")
+        with patch.object(sa, "_monotonic", return_value=1000.0 + sa._RESULT_CACHE_TTL):
+            sa._get_cached_records(conn, "SELECT COUNT(*) AS c FROM sales")
+
+        self.assertEqual(list(sa._result_cache), ["SELECT COUNT(*) AS c FROM sales"])
+        self.assertEqual(sa._result_cache_rows, 1)
+
+    def test_result_cache_is_capped_by_total_rows(self) -> None:
+        conn = sa._db.get_connection()
+
+        with patch.object(sa, "_RESULT_CACHE_MAX_ROWS", 40):
+            sa._get_cached_records(conn, "SELECT * FROM items LIMIT 20")
+            sa._get_cached_records(conn, "SELECT * FROM items LIMIT 25")
+            sa._get_cached_records(conn, "SELECT * FROM sales LIMIT 100")
+
+            self.assertEqual(list(sa._result_cache), ["SELECT * FROM items LIMIT 25"])
+            self.assertEqual(sa._result_cache_rows, 25)
+
+    def test_invoke_rejects_non_read_query(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+
+        messages = list(tool._invoke({"sql": "delete from sales"}))
+
+        self.assertEqual(len(messages), 1)
+        self.assertIn("error", messages[0])
+        self.assertIn("DELETE", messages[0]["error"])
+        self.assertIsNone(sa._db._conn)
+
+    def test_invoke_rejects_multiple_statements(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+
+        messages = list(tool._invoke({"sql": "SELECT 1 AS x; DROP TABLE items"}))
+
+        self.assertEqual(len(messages), 1)
+        self.assertIn("error", messages[0])
+        conn = sa._db.get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        self.assertEqual(count, 29)
+
+    def test_invoke_rejects_explain_analyze(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+
+        messages = list(tool._invoke({"sql": "EXPLAIN ANALYZE DELETE FROM sales"}))
+
+        self.assertEqual(len(messages), 1)
+        self.assertIn("EXPLAIN ANALYZE", messages[0]["error"])
+        conn = sa._db.get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+        self.assertGreater(count, 0)
+
+    def test_invoke_rejects_pragma_setting(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+
+        messages = list(tool._invoke({"sql": "PRAGMA threads=16"}))
+
+        self.assertIn("error", messages[0])
+        conn = sa._db.get_connection()
+        threads = conn.execute("SELECT current_setting('threads')").fetchone()[0]
+        self.assertEqual(threads, 2)
+
+    def test_invoke_accepts_pivot_query(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+        sql = (
+            "PIVOT (SELECT category, weather, total_amount FROM sales) "
+            "ON weather USING SUM(total_amount)"
+        )
+
+        messages = list(tool._invoke({"sql": sql}))
+
+        self.assertIsInstance(messages[0], list)
+        self.assertEqual(len(messages[0]), 10)
+        self.assertIn("category", messages[0][0])
+
+    def test_invoke_rejects_pivot_followed_by_drop(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+        sql = "PIVOT sales ON weather USING SUM(total_amount); DROP TABLE items"
+
+        messages = list(tool._invoke({"sql": sql}))
+
+        self.assertIn("error", messages[0])
+        count = sa._db.get_connection().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        self.assertEqual(count, 29)
+
+    def test_invoke_accepts_reads_not_starting_with_select(self) -> None:
+        tool = object.__new__(sa.SalesAnalyticsTool)
+        tool.create_json_message = lambda payload: payload
+
+        for sql in ("FROM items LIMIT 1", "(SELECT 1 AS x)", "-- 件数\nSELECT 1 AS x"):
+            with self.subTest(sql=sql):
+                messages = list(tool._invoke({"sql": sql}))
+
+                self.assertIsInstance(messages[0], list)
+                self.assertEqual(len(messages[0]), 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,5 @@
 import sys
+import threading
 import unittest
 from pathlib import Path
 
@@ -22,6 +23,69 @@ class TestShiftManager(unittest.TestCase):
         self.assertGreaterEqual(staff_count, 12)
         self.assertGreaterEqual(shift_count, 90)
 
+    def test_get_connection_is_shared_across_concurrent_first_calls(self) -> None:
+        conns = []
+        barrier = threading.Barrier(4)
+
+        def worker() -> None:
+            barrier.wait()
+            conns.append(sm._db.get_connection())
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len({id(c) for c in conns}), 1)
+        staff_count = conns[0].execute("SELECT COUNT(*) FROM staff").fetchone()[0]
+        self.assertEqual(staff_count, 12)
+
+    def test_invoke_returns_decimal_results_as_float(self) -> None:
+        tool = object.__new__(sm.ShiftManagerTool)
+        tool.create_json_message = lambda payload: payload
+
+        messages = list(
+            tool._invoke({"sql": "SELECT 1500 * 1.5 AS rate, CAST(NULL AS DECIMAL(4, 1)) AS missing"})
+        )
+
+        row = messages[0][0]
+        self.assertIs(type(row["rate"]), float)
+        self.assertEqual(row["rate"], 2250.0)
+        self.assertIsNone(row["missing"])
+
+    def test_invoke_returns_nested_decimal_results_as_float(self) -> None:
+        tool = object.__new__(sm.ShiftManagerTool)
+        tool.create_json_message = lambda payload: payload
+        sql = (
+            "SELECT [SUM(hourly_rate)::DECIMAL(18, 2)] AS rates, "
+            "{'max': MAX(hourly_rate)::DECIMAL(10, 1)} AS stats FROM staff"
+        )
+
+        row = list(tool._invoke({"sql": sql}))[0][0]
+
+        self.assertIs(type(row["rates"][0]), float)
+        self.assertIs(type(row["stats"]["max"]), float)
+
+    def test_invoke_returns_timestamptz_results(self) -> None:
+        from datetime import datetime
+
+        tool = object.__new__(sm.ShiftManagerTool)
+        tool.create_json_message = lambda payload: payload
+
+        messages = list(tool._invoke({"sql": "SELECT NOW() AS now"}))
+
+        self.assertIsInstance(messages[0], list)
+        self.assertIsInstance(messages[0][0]["now"], datetime)
+        self.assertIsNotNone(messages[0][0]["now"].tzinfo)
+
+    def test_get_connection_applies_resource_limits(self) -> None:
+        conn = sm._db.get_connection()
+
+        threads = conn.execute("SELECT current_setting('threads')").fetchone()[0]
+
+        self.assertEqual(threads, 2)
+
     def test_invoke_returns_error_when_sql_missing(self) -> None:
         tool = object.__new__(sm.ShiftManagerTool)
         tool.create_json_message = lambda body: body
@@ -41,6 +105,20 @@ class TestShiftManager(unittest.TestCase):
         self.assertEqual(len(messages), 1)
         self.assertEqual(messages[0][0]["c"], 12)
 
+    def test_invoke_returns_native_python_values(self) -> None:
+        from datetime import date
+
+        tool = object.__new__(sm.ShiftManagerTool)
+        tool.create_json_message = lambda body: body
+
+        messages = list(
+            tool._invoke({"sql": "SELECT date, cancelled_at FROM shifts LIMIT 1"})
+        )
+
+        row = messages[0][0]
+        self.assertIs(type(row["date"]), date)
+        self.assertIsNone(row["cancelled_at"])
+
     def test_invoke_accepts_query_alias(self) -> None:
         tool = object.__new__(sm.ShiftManagerTool)
         tool.create_json_message = lambda body: body
@@ -50,6 +128,54 @@ class TestShiftManager(unittest.TestCase):
         self.assertEqual(len(messages), 1)
         self.assertEqual(messages[0][0]["c"], 12)
 
+    def test_staff_rows_are_cached_until_write(self) -> None:
+        conn = sm._db.get_connection()
+        first = sm._get_staff_rows(conn, "id, hourly_rate")
+        self.assertIs(sm._get_staff_rows(conn, "id, hourly_rate"), first)
+
+        tool = object.__new__(sm.ShiftManagerTool)
+        tool.create_json_message = lambda body: body
+        list(tool._invoke({"sql": "UPDATE staff SET hourly_rate = 9999 WHERE id = 'tanaka'"}))
+
+        rows = dict(sm._get_staff_rows(conn, "id, hourly_rate"))
+        self.assertEqual(rows["tanaka"], 9999)
+
+    def test_invoke_rejects_schema_changes(self) -> None:
+        tool = object.__new__(sm.ShiftManagerTool)
+        tool.create_json_message = lambda body: body
+
+        messages = list(tool._invoke({"sql": "drop table staff"}))
+
+        self.assertEqual(len(messages), 1)
+        self.assertIn("DROP", messages[0]["error"])
+        staff_count = sm._db.get_connection().execute("SELECT COUNT(*) FROM staff").fetchone()[0]
+        self.assertEqual(staff_count, 12)
+
+    def test_invoke_rejects_multiple_statements(self) -> None:
+        tool = object.__new__(sm.ShiftManagerTool)
+        tool.create_json_message = lambda body: body
+
+        messages = list(tool._invoke({"sql": "SELECT 1; DROP TABLE swap_requests"}))
+
+        self.assertEqual(len(messages), 1)
+        self.assertIn("error", messages[0])
+        tables = sm._db.get_connection().execute("SHOW TABLES").fetchall()
+        self.assertIn(("swap_requests",), tables)
+
+    def test_invoke_rejects_select_followed_by_update(self) -> None:
+        conn = sm._db.get_connection()
+        before = dict(sm._get_staff_rows(conn, "id, hourly_rate"))
+
+        tool = object.__new__(sm.ShiftManagerTool)
+        tool.create_json_message = lambda body: body
+        messages = list(
+            tool._invoke({"sql": "SELECT 1; UPDATE staff SET hourly_rate = 9999 WHERE id = 'tanaka'"})
+        )
+
+        self.assertIn("error", messages[0])
+        rate = conn.execute("SELECT hourly_rate FROM staff WHERE id = 'tanaka'").fetchone()[0]
+        self.assertEqual(rate, before["tanaka"])
+
     def test_invoke_returns_error_for_invalid_sql(self) -> None:
         tool = object.__new__(sm.ShiftManagerTool)
         tool.create_json_message = lambda body: body
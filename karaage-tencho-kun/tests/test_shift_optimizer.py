@@ -1,6 +1,7 @@
 import sys
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 PLUGIN_ROOT = Path(__file__).resolve().parents[1]
 if str(PLUGIN_ROOT) not in sys.path:
@@ -113,11 +114,24 @@ class TestShiftOptimizer(unittest.TestCase):
         wed_slots = so._parse_availability(avail_json, "wed")
         self.assertEqual(wed_slots, [])
 
-    def test_check_hour_coverage(self) -> None:
-        self.assertTrue(so._check_hour_coverage(9, 17, 12))
-        self.assertTrue(so._check_hour_coverage(9, 17, 9))
-        self.assertFalse(so._check_hour_coverage(9, 17, 17))
-        self.assertFalse(so._check_hour_coverage(9, 17, 8))
+    def test_overnight_slot_covers_early_morning_peak(self) -> None:
+        """深夜シフト（22:00-06:00）は早朝のピーク時間をカバーしたものとして扱う。"""
+        night_staff = [
+            ("night", "夜勤スタッフ", "part_time", 1200, [], '{"fri": ["22:00-06:00"]}'),
+        ]
+        overnight_peak = {"hours": range(3, 5), "min_staff": 3, "label": "深夜ピーク"}
+
+        with patch.object(so, "_get_staff_rows", return_value=night_staff), patch.dict(
+            so.BASE_STAFF_REQUIREMENTS, {"overnight_peak": overnight_peak}
+        ):
+            tool = self._make_tool()
+            result = list(tool._invoke({"date": "2026-02-20", "optimize_cost": True}))[0]
+
+        self.assertIn(3, result["predicted_demand"]["peak_hours"])
+        shifts = [s for s in result["suggested_shifts"] if s["staff_id"] == "night"]
+        self.assertEqual(len(shifts), 1)
+        self.assertEqual(shifts[0]["reason"], "ピーク時間カバー")
+        self.assertEqual((shifts[0]["start"], shifts[0]["end"]), ("22:00", "06:00"))
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 import sys
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 PLUGIN_ROOT = Path(__file__).resolve().parents[1]
 if str(PLUGIN_ROOT) not in sys.path:
@@ -28,6 +29,20 @@ class TestShiftTableGenerator(unittest.TestCase):
         self.assertIn("error", messages[0])
         self.assertIn("available_types", messages[0])
 
+    def test_span_hours_handles_overnight_and_short_hour(self) -> None:
+        self.assertEqual(stg._span_hours("09:00", "17:00"), 8)
+        self.assertEqual(stg._span_hours("22:00", "06:00"), 8)
+        self.assertEqual(stg._span_hours("9:00", "17:30"), 8)
+
+    def test_invocations_initialize_schema_only_once(self) -> None:
+        tool = self._make_tool()
+
+        with patch.object(sm._db, "_init_schema_fn", wraps=sm._init_schema) as init:
+            for view_type in ("weekly", "daily", "staff", "weekly"):
+                list(tool._invoke({"view_type": view_type}))
+
+        self.assertEqual(init.call_count, 1)
+
     def test_weekly_view_returns_json(self) -> None:
         tool = self._make_tool()
         messages = list(tool._invoke({"view_type": "weekly"}))
@@ -225,6 +240,59 @@ class TestShiftTableGenerator(unittest.TestCase):
 
         self.assertEqual(after, before - 1, "UPDATE 後の confirmed 数が1件減っていない")
 
+    def test_malformed_shift_time_counts_as_zero_hours(self) -> None:
+        """時刻が "HH:MM" でないシフトはエラーにせず、勤務時間0として集計する。"""
+        conn = sm._db.get_connection()
+        target = conn.execute(
+            """
+            SELECT shift_id,
+                   CAST(split_part(end_time, ':', 1) AS INTEGER)
+                   - CAST(split_part(start_time, ':', 1) AS INTEGER)
+            FROM shifts
+            WHERE date = CURRENT_DATE AND status != 'cancelled'
+              AND end_time > start_time
+            LIMIT 1
+            """
+        ).fetchone()
+        if target is None:
+            self.skipTest("今日のシフトが無いためスキップ")
+
+        tool = self._make_tool()
+        before = list(tool._invoke({"view_type": "weekly"}))[0]["summary"]
+        conn.execute("UPDATE shifts SET start_time = '9時' WHERE shift_id = ?", [target[0]])
+
+        weekly = list(tool._invoke({"view_type": "weekly"}))[0]
+        staff = list(tool._invoke({"view_type": "staff"}))[0]
+
+        self.assertNotIn("error", weekly)
+        self.assertNotIn("error", staff)
+        self.assertEqual(weekly["summary"]["total_shifts"], before["total_shifts"])
+        self.assertEqual(weekly["summary"]["total_hours"], before["total_hours"] - target[1])
+
+    def test_null_skills_are_returned_as_empty_list(self) -> None:
+        """skills が NULL のスタッフは weekly / daily とも空リストで返る。"""
+        from datetime import datetime
+        from tools.datetime_utils import JST
+
+        today_str = datetime.now(JST).strftime("%Y-%m-%d")
+        conn = sm._db.get_connection()
+        staff_id = conn.execute(
+            "SELECT staff_id FROM shifts WHERE date = CURRENT_DATE AND status != 'cancelled' LIMIT 1"
+        ).fetchone()
+        if staff_id is None:
+            self.skipTest("今日のシフトが無いためスキップ")
+        conn.execute("UPDATE staff SET skills = NULL WHERE id = ?", [staff_id[0]])
+
+        tool = self._make_tool()
+        weekly = list(tool._invoke({"view_type": "weekly"}))[0]
+        daily = list(tool._invoke({"view_type": "daily", "start_date": today_str}))[0]
+
+        weekly_staff = [e["staff"] for e in weekly["schedule"] if e["staff"]["id"] == staff_id[0]]
+        self.assertEqual(weekly_staff[0]["skills"], [])
+        daily_skills = [s["skills"] for s in daily["shifts"] if s["staff_id"] == staff_id[0]]
+        self.assertTrue(daily_skills)
+        self.assertTrue(all(skills == [] for skills in daily_skills))
+
     def test_overrides_cancelled_excludes_staff_from_weekly(self) -> None:
         """overrides.cancelled で指定したスタッフ×日付がweekly表から除外される。"""
         from datetime import datetime
@@ -341,6 +409,22 @@ class TestShiftTableGenerator(unittest.TestCase):
         self.assertNotIn("tanaka", staff_ids, "tanaka が除外されていない")
         self.assertIn("kobayashi", staff_ids, "kobayashi が追加されていない")
 
+    def test_overrides_cancelled_with_malformed_date_is_ignored(self) -> None:
+        """overrides.cancelled の日付が不正でもエラーにならない。"""
+        import json
+        overrides_str = json.dumps({
+            "cancelled": [
+                {"staff_id": "tanaka", "date": "tomorrow"},
+                {"staff_id": "sato", "date": "2026-2-3"},
+            ]
+        })
+        tool = self._make_tool()
+        before = list(tool._invoke({"view_type": "weekly"}))[0]
+        after = list(tool._invoke({"view_type": "weekly", "overrides": overrides_str}))[0]
+
+        self.assertNotIn("error", after)
+        self.assertEqual(after["summary"], before["summary"])
+
     def test_overrides_empty_string_is_ignored(self) -> None:
         """overrides が空文字列の場合はエラーにならない。"""
         tool = self._make_tool()
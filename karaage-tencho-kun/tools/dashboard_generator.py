@@ -14,6 +14,12 @@ from dify_plugin.entities.tool import ToolInvokeMessage
 from tools.datetime_utils import JST, WEEKDAY_JA_SUN_START
 from tools.sales_analytics import _get_connection as _get_sales_connection
 
+# 集計結果キャッシュ（レポートタイプ -> 集計結果）
+# 売上DBはツール経由では読み取り専用のため、接続・DB上の日付・売上行数が
+# 変わらない限り集計結果も変わらない。キーが変わったら丸ごと破棄する
+_result_cache: dict[str, dict] = {}
+_result_cache_key: tuple | None = None
+
 
 class DashboardGeneratorTool(Tool):
     """売上ダッシュボードデータをJSON形式で生成するツール。"""
@@ -25,49 +31,70 @@ class DashboardGeneratorTool(Tool):
             conn = _get_sales_connection()
             now = datetime.now(JST)
 
-            if report_type == "daily":
-                data = self._get_daily_data(conn, now)
-            elif report_type == "weekly":
-                data = self._get_weekly_data(conn, now)
-            elif report_type == "comparison":
-                data = self._get_comparison_data(conn, now)
-            else:
+            builders = {
+                "daily": self._get_daily_data,
+                "weekly": self._get_weekly_data,
+                "comparison": self._get_comparison_data,
+            }
+            if report_type not in builders:
                 yield self.create_json_message(
                     {
                         "error": f"不明なレポートタイプ: {report_type}",
-                        "available_types": ["daily", "weekly", "comparison"],
+                        "available_types": list(builders),
                     }
                 )
                 return
 
+            data = self._get_cached_data(conn, now, report_type, builders[report_type])
             yield self.create_json_message(data)
 
         except Exception as e:
             yield self.create_json_message({"error": str(e)})
 
+    @staticmethod
+    def _get_cached_data(conn, now: datetime, report_type: str, build) -> dict:
+        """集計結果をキャッシュ経由で取得する。
+
+        接続・DB上の日付・売上行数・JSTの日付が前回と同じならキャッシュを返す。
+        generated_at のみ呼び出しごとに現在時刻で更新する。
+
+        Args:
+            conn: 売上DBの接続
+            now: 現在日時
+            report_type: レポートタイプ
+            build: キャッシュが無い場合に集計を行う関数 (conn, now) -> dict
+        """
+        global _result_cache_key
+        db_date, row_count = conn.execute(
+            "SELECT CURRENT_DATE, COUNT(*) FROM sales"
+        ).fetchone()
+        key = (conn, db_date, row_count, now.date())
+        if key != _result_cache_key:
+            _result_cache.clear()
+            _result_cache_key = key
+
+        data = _result_cache.get(report_type)
+        if data is None:
+            data = build(conn, now)
+            _result_cache[report_type] = data
+        return {**data, "generated_at": now.isoformat()}
+
     def _get_daily_data(self, conn, now: datetime) -> dict:
         """日次ダッシュボードデータを取得する。
 
         KPI（売上・販売点数・客単価・前日比）、時間別売上、カテゴリ別売上を返す。
         """
 
-        # 今日の売上データ
-        today_data = conn.execute("""
+        # 今日・昨日（比較用）の売上データを1回のスキャンで取得
+        kpi_row = conn.execute("""
             SELECT
-                SUM(total_amount) as total_sales,
-                SUM(quantity) as total_items,
-                COUNT(DISTINCT sale_id) as transactions
+                SUM(total_amount) FILTER (WHERE sale_date = CURRENT_DATE) as total_sales,
+                SUM(quantity) FILTER (WHERE sale_date = CURRENT_DATE) as total_items,
+                COUNT(DISTINCT sale_id) FILTER (WHERE sale_date = CURRENT_DATE) as transactions,
+                SUM(total_amount) FILTER (WHERE sale_date = CURRENT_DATE - 1) as yesterday_sales,
+                SUM(quantity) FILTER (WHERE sale_date = CURRENT_DATE - 1) as yesterday_items
             FROM sales
-            WHERE sale_date = CURRENT_DATE
-        """).fetchone()
-
-        # 昨日のデータ（比較用）
-        yesterday_data = conn.execute("""
-            SELECT
-                SUM(total_amount) as total_sales,
-                SUM(quantity) as total_items
-            FROM sales
-            WHERE sale_date = CURRENT_DATE - 1
+            WHERE sale_date >= CURRENT_DATE - 1 AND sale_date <= CURRENT_DATE
         """).fetchone()
 
         # 時間別売上
@@ -92,11 +119,11 @@ class DashboardGeneratorTool(Tool):
             ORDER BY sales DESC
         """).fetchall()
 
-        total_sales = today_data[0] or 0
-        total_items = today_data[1] or 0
-        transactions = today_data[2] or 0
-        yesterday_sales = yesterday_data[0] or 0
-        yesterday_items = yesterday_data[1] or 0
+        total_sales = kpi_row[0] or 0
+        total_items = kpi_row[1] or 0
+        transactions = kpi_row[2] or 0
+        yesterday_sales = kpi_row[3] or 0
+        yesterday_items = kpi_row[4] or 0
         avg_transaction = round(total_sales / transactions) if transactions > 0 else 0
 
         # 変化率計算
@@ -118,7 +145,7 @@ class DashboardGeneratorTool(Tool):
 
         return {
             "report_type": "daily",
-            "date": now.strftime("%Y-%m-%d"),
+            "date": now.date().isoformat(),
             "generated_at": now.isoformat(),
             "kpi": {
                 "total_sales": total_sales,
@@ -153,24 +180,16 @@ class DashboardGeneratorTool(Tool):
             ORDER BY sale_date
         """).fetchall()
 
-        # 週間合計
+        # 週間合計と前週売上を1回のスキャンで取得
         week_totals = conn.execute("""
             SELECT
-                SUM(total_amount) as total_sales,
-                SUM(quantity) as total_items,
-                COUNT(DISTINCT sale_id) as transactions
-            FROM sales
-            WHERE sale_date >= CURRENT_DATE - 6
-            AND sale_date <= CURRENT_DATE
-        """).fetchone()
-
-        # 前週データ
-        prev_week = conn.execute("""
-            SELECT
-                SUM(total_amount) as total_sales
+                SUM(total_amount) FILTER (WHERE sale_date >= CURRENT_DATE - 6) as total_sales,
+                SUM(quantity) FILTER (WHERE sale_date >= CURRENT_DATE - 6) as total_items,
+                COUNT(DISTINCT sale_id) FILTER (WHERE sale_date >= CURRENT_DATE - 6) as transactions,
+                SUM(total_amount) FILTER (WHERE sale_date <= CURRENT_DATE - 7) as prev_sales
             FROM sales
             WHERE sale_date >= CURRENT_DATE - 13
-            AND sale_date <= CURRENT_DATE - 7
+            AND sale_date <= CURRENT_DATE
         """).fetchone()
 
         # カテゴリ別週間売上
@@ -198,7 +217,7 @@ class DashboardGeneratorTool(Tool):
         total_sales = week_totals[0] or 0
         total_items = week_totals[1] or 0
         transactions = week_totals[2] or 0
-        prev_sales = prev_week[0] or 0
+        prev_sales = week_totals[3] or 0
         daily_avg = round(total_sales / 7) if total_sales > 0 else 0
 
         sales_change = self._calc_change(total_sales, prev_sales)
@@ -244,66 +263,49 @@ class DashboardGeneratorTool(Tool):
         KPI（今週/先週の合計・差額・変化率）、曜日別・カテゴリ別の比較データを返す。
         """
 
-        # 今週データ（曜日別）
-        this_week = conn.execute("""
+        # 今週・先週の曜日別売上
+        dow_sales = conn.execute("""
             SELECT
                 EXTRACT(DOW FROM sale_date) as dow,
-                SUM(total_amount) as sales
+                SUM(total_amount) FILTER (WHERE sale_date >= CURRENT_DATE - 6) as this_week,
+                SUM(total_amount) FILTER (WHERE sale_date <= CURRENT_DATE - 7) as last_week
             FROM sales
-            WHERE sale_date >= CURRENT_DATE - 6
+            WHERE sale_date >= CURRENT_DATE - 13
             AND sale_date <= CURRENT_DATE
             GROUP BY EXTRACT(DOW FROM sale_date)
             ORDER BY dow
         """).fetchall()
 
-        # 先週データ（曜日別）
-        last_week = conn.execute("""
+        # 週間合計
+        totals = conn.execute("""
             SELECT
-                EXTRACT(DOW FROM sale_date) as dow,
-                SUM(total_amount) as sales
+                SUM(total_amount) FILTER (WHERE sale_date >= CURRENT_DATE - 6),
+                SUM(total_amount) FILTER (WHERE sale_date <= CURRENT_DATE - 7)
             FROM sales
             WHERE sale_date >= CURRENT_DATE - 13
-            AND sale_date <= CURRENT_DATE - 7
-            GROUP BY EXTRACT(DOW FROM sale_date)
-            ORDER BY dow
-        """).fetchall()
-
-        # 週間合計
-        this_total = conn.execute("""
-            SELECT SUM(total_amount) FROM sales
-            WHERE sale_date >= CURRENT_DATE - 6
-        """).fetchone()[0] or 0
-
-        last_total = conn.execute("""
-            SELECT SUM(total_amount) FROM sales
-            WHERE sale_date >= CURRENT_DATE - 13
-            AND sale_date <= CURRENT_DATE - 7
-        """).fetchone()[0] or 0
-
-        # カテゴリ別比較
-        this_cat = conn.execute("""
-            SELECT category, SUM(total_amount) as sales
-            FROM sales
-            WHERE sale_date >= CURRENT_DATE - 6
-            GROUP BY category
-            ORDER BY sales DESC
-        """).fetchall()
+        """).fetchone()
+        this_total = totals[0] or 0
+        last_total = totals[1] or 0
 
-        last_cat = conn.execute("""
-            SELECT category, SUM(total_amount) as sales
+        # カテゴリ別比較（今週売上のあるカテゴリのみ）
+        category_sales = conn.execute("""
+            SELECT
+                category,
+                SUM(total_amount) FILTER (WHERE sale_date >= CURRENT_DATE - 6) as this_week,
+                SUM(total_amount) FILTER (WHERE sale_date <= CURRENT_DATE - 7) as last_week
             FROM sales
             WHERE sale_date >= CURRENT_DATE - 13
-            AND sale_date <= CURRENT_DATE - 7
             GROUP BY category
-            ORDER BY sales DESC
+            HAVING this_week IS NOT NULL
+            ORDER BY this_week DESC
         """).fetchall()
 
         change_amount = this_total - last_total
         sales_change = self._calc_change(this_total, last_total)
 
         # 曜日別データを整形（日曜始まり — DuckDB EXTRACT(DOW) に合わせる）
-        this_week_data = {int(row[0]): row[1] for row in this_week}
-        last_week_data = {int(row[0]): row[1] for row in last_week}
+        this_week_data = {int(row[0]): row[1] or 0 for row in dow_sales}
+        last_week_data = {int(row[0]): row[2] or 0 for row in dow_sales}
 
         dow_comparison = [
             {
@@ -316,14 +318,13 @@ class DashboardGeneratorTool(Tool):
         ]
 
         # カテゴリ別データを整形
-        last_cat_dict = {row[0]: row[1] for row in last_cat}
         category_comparison = [
             {
                 "category": row[0],
                 "this_week": row[1],
-                "last_week": last_cat_dict.get(row[0], 0),
+                "last_week": row[2] or 0,
             }
-            for row in this_cat
+            for row in category_sales
         ]
 
         return {
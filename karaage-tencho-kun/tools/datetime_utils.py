@@ -29,6 +29,9 @@ WEEKDAY_JA_SUN_START = ["日", "月", "火", "水", "木", "金", "土"]
 WEEKDAY_KEYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
 """曜日キー（英語略称、availability JSONのキーに対応）。"""
 
+_HOUR_BY_HH = {f"{h:02d}": h for h in range(25)}
+""""HH" -> 時 の変換表（parse_hour で split + int を避けるための辞書引き）。"""
+
 
 # --- 共有ユーティリティ関数 ---
 
@@ -69,6 +72,14 @@ def format_date_ja(date_str: str) -> str:
         return date_str
 
 
+def parse_hour(time_str: str) -> int:
+    """"HH:MM" 形式の時刻文字列から時を返す。"H:MM" 形式にもフォールバックで対応。"""
+    hour = _HOUR_BY_HH.get(time_str[:2])
+    if hour is None:
+        hour = int(time_str.split(":")[0])
+    return hour
+
+
 def parse_expires_at(expires_at: str | datetime, now: datetime) -> datetime:
     """消費期限をdatetimeに変換する。
 
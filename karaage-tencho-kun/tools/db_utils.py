@@ -7,7 +7,10 @@ Difyクラウド環境はファイルシステムが読み取り専用のため
 """
 
 import json
+import re
+import threading
 from collections.abc import Callable
+from decimal import Decimal
 from pathlib import Path
 from typing import Any
 
@@ -16,6 +19,90 @@ import duckdb
 # プラグインルートディレクトリ（data/ の親）
 _PLUGIN_ROOT = Path(__file__).resolve().parent.parent
 
+# データを変更しないSQL文の種別（DESCRIBE / SHOW / SUMMARIZE は SELECT に分類される）
+READ_ONLY_STATEMENT_KINDS = frozenset({"SELECT", "EXPLAIN"})
+
+# 行データのみを変更するSQL文の種別（スキーマは変更しない）
+DML_STATEMENT_KINDS = frozenset({"INSERT", "UPDATE", "DELETE"})
+
+# EXPLAIN ANALYZE は対象の文を実際に実行するため、通常の EXPLAIN と区別する
+_ANALYZE_RE = re.compile(r"\bANALY[SZ]E\b", re.IGNORECASE)
+
+# DuckDB接続の設定。既定値（論理コア数のスレッド・物理メモリの80%）は
+# 小さなテーブルしか扱わない本プラグインには過大で、1プロセスに
+# 複数のDBを持つため、スレッド数とメモリ上限を明示的に抑える
+_CONNECTION_CONFIG = {"threads": 2, "memory_limit": "256MB"}
+
+
+def _decimals_to_float(value: Any) -> Any:
+    """Decimal を float に変換する。LIST / ARRAY / STRUCT / MAP の中も再帰的に変換する。"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, list):
+        return [_decimals_to_float(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_decimals_to_float(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _decimals_to_float(v) for k, v in value.items()}
+    return value
+
+
+def fetch_records(conn: duckdb.DuckDBPyConnection, sql: str) -> list[dict[str, Any]]:
+    """SQLを実行し、結果を列名をキーとする辞書のリストで返す。
+
+    pandas DataFrame を経由せず、DuckDBの行タプルから直接組み立てる。
+    DATE列は datetime.date、NULLは None のまま返る。
+    DECIMAL（LIST / STRUCT 等の要素を含む）は float に変換して返す。
+    TIMESTAMPTZ列の変換にはDuckDBが pytz を必要とする（requirements.txt に記載）。
+    """
+    result = conn.execute(sql)
+    if result.description is None:
+        return []
+    columns = [d[0] for d in result.description]
+    records = [dict(zip(columns, row)) for row in result.fetchall()]
+
+    # DECIMAL は Decimal で返り JSON では文字列になるため、数値として float に揃える
+    # 入れ子の型（DECIMAL(18,2)[] や STRUCT(x DECIMAL(4,1)) 等）も型名で判定する
+    decimal_columns = [d[0] for d in result.description if "DECIMAL" in str(d[1])]
+    if decimal_columns:
+        for record in records:
+            for column in decimal_columns:
+                record[column] = _decimals_to_float(record[column])
+    return records
+
+
+def classify_statement(sql: str) -> str:
+    """SQLを実行せずにパースし、単一の文であればその種別名を返す。
+
+    先頭キーワードの文字列比較ではなくDuckDBのパーサで判定するため、
+    コメントや括弧で始まる読み取りクエリも正しく分類でき、
+    `SELECT 1; DROP TABLE ...` のような複数文の連結は拒否できる。
+    パースにはツールのDB接続を使わないため、シードの初期化も発生しない。
+
+    Returns:
+        StatementType の名前（"SELECT", "INSERT", "DROP" など）。
+        EXPLAIN ANALYZE の場合は "EXPLAIN ANALYZE"。
+
+    Raises:
+        ValueError: 文が1つでない場合
+        duckdb.ParserException: SQLの構文が不正な場合
+    """
+    # 静的な IN 句を持たない PIVOT は、列挙型を作る内部の CREATE 文（クエリ文字列が空）と
+    # SELECT 文に展開されるため、内部文は文数・種別の判定から除く
+    statements = [
+        statement
+        for statement in duckdb.extract_statements(sql)
+        if not (statement.type.name == "CREATE" and not statement.query)
+    ]
+    if len(statements) != 1:
+        raise ValueError(f"SQL文は1回に1つだけ指定してください（{len(statements)}文）")
+
+    statement = statements[0]
+    kind = statement.type.name
+    if kind == "EXPLAIN" and _ANALYZE_RE.search(statement.query):
+        return "EXPLAIN ANALYZE"
+    return kind
+
 
 class DuckDBManager:
     """インメモリDuckDB接続とシードデータのキャッシュを管理する。
@@ -49,6 +136,7 @@ class DuckDBManager:
         self._init_schema_fn = init_schema_fn
         self._seed_cache: dict[str, Any] | None = None
         self._conn: duckdb.DuckDBPyConnection | None = None
+        self._init_lock = threading.Lock()
 
     def load_seed_data(self) -> dict[str, Any]:
         """シードデータJSONを読み込み、キャッシュして返す。"""
@@ -59,10 +147,21 @@ class DuckDBManager:
         return self._seed_cache
 
     def get_connection(self) -> duckdb.DuckDBPyConnection:
-        """DuckDB接続を取得する。初回呼び出し時にスキーマを初期化する。"""
+        """DuckDB接続を取得する。初回呼び出し時にスキーマを初期化する。
+
+        同時に複数スレッドから初回呼び出しされても初期化が一度だけ行われるよう、
+        ダブルチェックロッキングで保護する（初期化済みならロックは取らない）。
+        """
         if self._conn is None:
-            self._conn = duckdb.connect(":memory:")
-            self._init_schema_fn(self._conn, self.load_seed_data())
+            with self._init_lock:
+                if self._conn is None:
+                    conn = duckdb.connect(":memory:", config=dict(_CONNECTION_CONFIG))
+                    # スキーマ作成とシード投入は1トランザクションにまとめ、
+                    # 文ごとの自動コミットを避ける
+                    conn.execute("BEGIN TRANSACTION")
+                    self._init_schema_fn(conn, self.load_seed_data())
+                    conn.execute("COMMIT")
+                    self._conn = conn
         return self._conn
 
     def reset(self) -> None:
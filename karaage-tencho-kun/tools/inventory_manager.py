@@ -516,9 +516,7 @@ class InventoryManagerTool(Tool):
         category_orders = {}
         for rec in recommendations:
             cat = rec["category"]
-            if cat not in category_orders:
-                category_orders[cat] = 0
-            category_orders[cat] += rec["recommended_order_quantity"]
+            category_orders[cat] = category_orders.get(cat, 0) + rec["recommended_order_quantity"]
 
         return {
             "current_time": now.isoformat(),
@@ -147,9 +147,7 @@ class OrderOptimizerTool(Tool):
             exp_dt = parse_expires_at(expires_at, now)
             remaining_hours = (exp_dt - now).total_seconds() / 3600
 
-            if cat not in by_category:
-                by_category[cat] = []
-            by_category[cat].append({
+            by_category.setdefault(cat, []).append({
                 "item_id": item_id,
                 "item_name": item_name,
                 "category": cat,
@@ -4,14 +4,28 @@ SQL文を受け取り、売上データに対してクエリを実行する。
 テーブル: items, sales, daily_summary。
 """
 
+import re
+import time
+from collections import OrderedDict
 from collections.abc import Generator
 from typing import Any
 
 import duckdb
+import pandas as pd
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
-from tools.db_utils import DuckDBManager
+from tools.db_utils import (
+    READ_ONLY_STATEMENT_KINDS,
+    DuckDBManager,
+    classify_statement,
+    fetch_records,
+)
+
+# 天気別の需要倍率（demand_group -> 倍率）
+_DEMAND_MULT_RAINY = {"hot_snack": 0.8, "cold": 0.5, "warm": 1.5, "normal": 1.0}
+_DEMAND_MULT_SUNNY_WARM = {"hot_snack": 1.2, "cold": 1.3, "warm": 0.8, "normal": 1.0}
+_DEMAND_MULT_DEFAULT = {"hot_snack": 1.0, "cold": 1.0, "warm": 1.0, "normal": 1.0}
 
 
 def _init_schema(conn: duckdb.DuckDBPyConnection, seed_data: dict[str, Any]) -> None:
@@ -54,28 +68,29 @@ def _init_schema(conn: duckdb.DuckDBPyConnection, seed_data: dict[str, Any]) ->
         )
     """)
 
-    conn.executemany(
-        "INSERT INTO items VALUES (?, ?, ?, ?)",
-        [
-            (
-                item["item_id"],
-                item["item_name"],
-                item["category"],
-                item["unit_price"],
-            )
-            for item in seed_data["items_master"]
-        ],
+    # 商品マスタは列指向のDataFrameとして一括投入する（行ごとのINSERTを避ける）
+    items_df = pd.DataFrame(
+        seed_data["items_master"],
+        columns=["item_id", "item_name", "category", "unit_price"],
     )
+    conn.register("items_seed", items_df)
+    conn.execute("""
+        INSERT INTO items
+        SELECT item_id, item_name, category, unit_price FROM items_seed
+    """)
+    conn.unregister("items_seed")
 
     _generate_sample_sales(conn, seed_data)
 
 
 def _generate_sample_sales(conn: duckdb.DuckDBPyConnection, seed_data: dict[str, Any]) -> None:
-    """サンプル売上データを生成する（SQLで効率的に挿入）。"""
+    """サンプル売上データを生成する（行をまとめてDataFrameから一括挿入）。"""
 
     daily_patterns = seed_data["daily_patterns"]
     item_profiles = seed_data["hourly_item_profiles"]
 
+    sales_rows = []
+    summary_rows = []
     sale_id = 1
     for pattern in daily_patterns:
         offset = pattern["offset"]
@@ -87,11 +102,11 @@ def _generate_sample_sales(conn: duckdb.DuckDBPyConnection, seed_data: dict[str,
         base_multiplier = 1.2 if is_weekend else 1.0
 
         if weather == "rainy":
-            demand_mult = {"hot_snack": 0.8, "cold": 0.5, "warm": 1.5, "normal": 1.0}
+            demand_mult = _DEMAND_MULT_RAINY
         elif weather == "sunny" and temp > 12:
-            demand_mult = {"hot_snack": 1.2, "cold": 1.3, "warm": 0.8, "normal": 1.0}
+            demand_mult = _DEMAND_MULT_SUNNY_WARM
         else:
-            demand_mult = {"hot_snack": 1.0, "cold": 1.0, "warm": 1.0, "normal": 1.0}
+            demand_mult = _DEMAND_MULT_DEFAULT
 
         daily_sales = 0
         daily_items = 0
@@ -122,11 +137,8 @@ def _generate_sample_sales(conn: duckdb.DuckDBPyConnection, seed_data: dict[str,
                 )
                 total = item["price"] * qty
 
-                conn.execute(
-                    """
-                    INSERT INTO sales VALUES (?, CURRENT_DATE + ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    [
+                sales_rows.append(
+                    (
                         f"S{sale_id:08d}",
                         offset,
                         hour,
@@ -139,20 +151,68 @@ def _generate_sample_sales(conn: duckdb.DuckDBPyConnection, seed_data: dict[str,
                         weather,
                         temp,
                         dow,
-                    ],
+                    )
                 )
 
                 sale_id += 1
                 daily_sales += total
                 daily_items += qty
 
-        conn.execute(
-            """
-            INSERT INTO daily_summary VALUES (CURRENT_DATE + ?, ?, ?, ?, ?, ?)
-            """,
-            [offset, daily_sales, daily_items, weather, temp, int(daily_items * 0.7)],
+        summary_rows.append(
+            (offset, daily_sales, daily_items, weather, temp, int(daily_items * 0.7))
         )
 
+    # 日付はDuckDB側の CURRENT_DATE 基準で計算し、行ごとのINSERTを1文にまとめる
+    sales_df = pd.DataFrame(
+        sales_rows,
+        columns=[
+            "sale_id",
+            "day_offset",
+            "sale_hour",
+            "item_id",
+            "item_name",
+            "category",
+            "quantity",
+            "unit_price",
+            "total_amount",
+            "weather",
+            "temperature",
+            "day_of_week",
+        ],
+    )
+    conn.register("sales_seed", sales_df)
+    conn.execute("""
+        INSERT INTO sales
+        SELECT
+            sale_id, CURRENT_DATE + CAST(day_offset AS INTEGER), sale_hour,
+            item_id, item_name, category, quantity, unit_price, total_amount,
+            weather, temperature, day_of_week
+        FROM sales_seed
+        ORDER BY sale_id
+    """)
+    conn.unregister("sales_seed")
+
+    summary_df = pd.DataFrame(
+        summary_rows,
+        columns=[
+            "day_offset",
+            "total_sales",
+            "total_items",
+            "weather",
+            "temperature",
+            "customer_count",
+        ],
+    )
+    conn.register("summary_seed", summary_df)
+    conn.execute("""
+        INSERT INTO daily_summary
+        SELECT
+            CURRENT_DATE + CAST(day_offset AS INTEGER), total_sales, total_items,
+            weather, temperature, customer_count
+        FROM summary_seed
+    """)
+    conn.unregister("summary_seed")
+
 
 # --- モジュールレベルのDB管理インスタンス ---
 _db = DuckDBManager("sales_analytics_seed.json", _init_schema)
@@ -161,6 +221,84 @@ _db = DuckDBManager("sales_analytics_seed.json", _init_schema)
 _load_seed_data = _db.load_seed_data
 _get_connection = _db.get_connection
 
+# クエリ結果の短期LRUキャッシュ（SQL文字列 -> (取得時刻, 結果行)）
+# 件数だけでなく保持する総行数にも上限を設け、大きな結果でメモリを占有しない
+_RESULT_CACHE_TTL = 30.0
+_RESULT_CACHE_MAXSIZE = 256
+_RESULT_CACHE_MAX_ROWS = 10_000
+_result_cache: OrderedDict[str, tuple[float, list[dict[str, Any]]]] = OrderedDict()
+_result_cache_rows = 0
+_result_cache_conn: duckdb.DuckDBPyConnection | None = None
+
+# キャッシュの時計（テストではこの関数を差し替える）
+_monotonic = time.monotonic
+
+# 呼び出しごとに結果が変わる関数。これらを含むSQLはキャッシュしない
+# （CURRENT_DATE は日中は一定のため対象外。日付の切り替わりはTTLで吸収する）
+_VOLATILE_SQL_RE = re.compile(
+    r"\b(NOW|CURRENT_TIMESTAMP|CURRENT_TIME|LOCALTIMESTAMP|LOCALTIME"
+    r"|GET_CURRENT_TIMESTAMP|GET_CURRENT_TIME|TRANSACTION_TIMESTAMP"
+    r"|RANDOM|SETSEED|UUID|GEN_RANDOM_UUID|UUIDV4|UUIDV7)\b",
+    re.IGNORECASE,
+)
+
+
+def _store_cached_records(sql: str, now: float, records: list[dict[str, Any]]) -> None:
+    """結果をキャッシュに格納し、期限切れ・上限超過のエントリを破棄する。"""
+    global _result_cache_rows
+
+    # 期限切れのエントリは再参照されなくても格納のたびに破棄する
+    expired = [
+        key
+        for key, (fetched, _) in _result_cache.items()
+        if now - fetched >= _RESULT_CACHE_TTL
+    ]
+    for key in expired:
+        _result_cache_rows -= len(_result_cache.pop(key)[1])
+
+    if len(records) > _RESULT_CACHE_MAX_ROWS:
+        return
+
+    _result_cache[sql] = (now, records)
+    _result_cache_rows += len(records)
+    while len(_result_cache) > _RESULT_CACHE_MAXSIZE or _result_cache_rows > _RESULT_CACHE_MAX_ROWS:
+        _, (_, evicted) = _result_cache.popitem(last=False)
+        _result_cache_rows -= len(evicted)
+
+
+def _get_cached_records(conn: duckdb.DuckDBPyConnection, sql: str) -> list[dict[str, Any]]:
+    """読み取りクエリの結果を短期キャッシュ付きで返す。
+
+    売上データは初期化後に変更されないため（SQLは読み取り文のみ受け付ける）、
+    会話内で同じSQLが繰り返された場合はDuckDBへの問い合わせを省略する。
+    CURRENT_DATE を含むクエリもあるため期限付きとし、
+    接続が作り直された場合は破棄する。NOW() / random() 等の
+    呼び出しごとに結果が変わる関数を含むSQLはキャッシュしない。
+    キャッシュ上の行を呼び出し側が変更しないよう、行の辞書は複製して返す。
+
+    Args:
+        conn: sales_analytics のDuckDB接続
+        sql: 実行する読み取りSQL
+    """
+    global _result_cache_conn, _result_cache_rows
+    if conn is not _result_cache_conn:
+        _result_cache.clear()
+        _result_cache_rows = 0
+        _result_cache_conn = conn
+
+    if _VOLATILE_SQL_RE.search(sql):
+        return fetch_records(conn, sql)
+
+    now = _monotonic()
+    cached = _result_cache.get(sql)
+    if cached is not None and now - cached[0] < _RESULT_CACHE_TTL:
+        _result_cache.move_to_end(sql)
+        return [dict(record) for record in cached[1]]
+
+    records = fetch_records(conn, sql)
+    _store_cached_records(sql, now, records)
+    return [dict(record) for record in records]
+
 
 class SalesAnalyticsTool(Tool):
     """SQL文で売上データを分析するツール。"""
@@ -172,10 +310,19 @@ class SalesAnalyticsTool(Tool):
             yield self.create_json_message({"error": "SQLが指定されていません"})
             return
 
+        # 実行前にパースし、単一の読み取り文以外はDB接続を開かずに弾く
+        try:
+            kind = classify_statement(sql)
+        except (ValueError, duckdb.Error) as e:
+            yield self.create_json_message({"error": str(e)})
+            return
+        if kind not in READ_ONLY_STATEMENT_KINDS:
+            yield self.create_json_message({"error": f"読み取りクエリのみ許可: {kind}"})
+            return
+
         try:
             conn = _db.get_connection()
-            result = conn.execute(sql).fetchdf()
-            yield self.create_json_message(result.to_dict(orient="records"))
+            yield self.create_json_message(_get_cached_records(conn, sql))
 
         except Exception as e:
             yield self.create_json_message({"error": str(e)})
@@ -7,13 +7,24 @@ SQL文を受け取り、シフトデータに対してクエリを実行する
 
 from collections.abc import Generator
 import json
+import time
 from typing import Any
 
 import duckdb
+import pandas as pd
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
-from tools.db_utils import DuckDBManager
+from tools.db_utils import (
+    DML_STATEMENT_KINDS,
+    READ_ONLY_STATEMENT_KINDS,
+    DuckDBManager,
+    classify_statement,
+    fetch_records,
+)
+
+# シフト管理で実行を許可するSQL文の種別（DDL等は不可）
+_ALLOWED_STATEMENT_KINDS = READ_ONLY_STATEMENT_KINDS | DML_STATEMENT_KINDS
 
 
 def _init_schema(conn: duckdb.DuckDBPyConnection, seed_data: dict[str, Any]) -> None:
@@ -73,15 +84,12 @@ def _init_schema(conn: duckdb.DuckDBPyConnection, seed_data: dict[str, Any]) ->
         )
     """)
 
-    # スタッフデータを挿入
-    staff_map = {}  # id -> name mapping for shifts
-    for s in seed_data["staff"]:
-        staff_map[s["id"]] = s["name"]
-        conn.execute(
-            """
-            INSERT INTO staff VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            [
+    # シードデータは列指向のDataFrameとして一括投入する（行ごとのINSERTを避ける）
+    staff_map = {s["id"]: s["name"] for s in seed_data["staff"]}  # id -> name
+
+    staff_df = pd.DataFrame(
+        [
+            (
                 s["id"],
                 s["name"],
                 s.get("name_reading"),
@@ -95,62 +103,92 @@ def _init_schema(conn: duckdb.DuckDBPyConnection, seed_data: dict[str, Any]) ->
                 s.get("line_id"),
                 s.get("color"),
                 s.get("notes"),
-            ],
-        )
-
-    # シフトデータを挿入（day_offset を CURRENT_DATE + offset で変換）
-    for shift in seed_data["shifts"]:
-        staff_name = staff_map.get(shift["staff_id"], "")
-        offset = shift["day_offset"]
-        conn.execute(
-            f"""
-            INSERT INTO shifts VALUES (
-                ?, ?, ?, CURRENT_DATE + ?, ?, ?, ?,
-                NOW() + INTERVAL '{offset}' DAY, ?, ?, ?, ?
             )
-            """,
-            [
+            for s in seed_data["staff"]
+        ],
+        columns=[
+            "id", "name", "name_reading", "role", "role_ja", "hourly_rate", "skills",
+            "availability", "preferred_hours", "phone", "line_id", "color", "notes",
+        ],
+    )
+    conn.register("staff_seed", staff_df)
+    conn.execute("""
+        INSERT INTO staff
+        SELECT id, name, name_reading, role, role_ja, hourly_rate,
+               CAST(skills AS VARCHAR[]), availability, preferred_hours,
+               phone, line_id, color, notes
+        FROM staff_seed
+    """)
+    conn.unregister("staff_seed")
+
+    # シフトデータ（day_offset を CURRENT_DATE + offset で変換）
+    shifts_df = pd.DataFrame(
+        [
+            (
                 shift["id"],
                 shift["staff_id"],
-                staff_name,
-                offset,
+                staff_map.get(shift["staff_id"], ""),
+                shift["day_offset"],
                 shift["start"],
                 shift["end"],
                 shift.get("status", "confirmed"),
-                None,  # cancelled_at
                 shift.get("cancel_reason"),
                 shift.get("swapped_from"),
-                None,  # swapped_at
-            ],
-        )
-
-    # シフト交代リクエストを挿入
-    for swap in seed_data["swap_requests"]:
-        original_name = staff_map.get(swap["original_staff_id"], "")
-        approved_name = staff_map.get(swap.get("approved_staff_id", ""), None)
-        offset = swap["day_offset"]
-        conn.execute(
-            f"""
-            INSERT INTO swap_requests VALUES (
-                ?, ?, ?, ?, CURRENT_DATE + ?, ?, ?, ?,
-                ?, NOW() + INTERVAL '{offset}' DAY, ?, ?, ?
             )
-            """,
-            [
+            for shift in seed_data["shifts"]
+        ],
+        columns=[
+            "shift_id", "staff_id", "staff_name", "day_offset", "start_time", "end_time",
+            "status", "cancel_reason", "swapped_from",
+        ],
+    )
+    conn.register("shifts_seed", shifts_df)
+    conn.execute("""
+        INSERT INTO shifts
+        SELECT shift_id, staff_id, staff_name,
+               CURRENT_DATE + CAST(day_offset AS INTEGER),
+               start_time, end_time, status,
+               NOW() + to_days(CAST(day_offset AS INTEGER)),
+               NULL, cancel_reason, swapped_from, NULL
+        FROM shifts_seed
+    """)
+    conn.unregister("shifts_seed")
+
+    # シフト交代リクエスト
+    swaps_df = pd.DataFrame(
+        [
+            (
                 swap["id"],
                 swap["shift_id"],
                 swap["original_staff_id"],
-                original_name,
-                offset,
+                staff_map.get(swap["original_staff_id"], ""),
+                swap["day_offset"],
                 swap["start"],
                 swap["end"],
                 swap.get("reason"),
                 swap.get("status", "pending"),
                 swap.get("approved_staff_id"),
-                approved_name,
-                None,  # approved_at
-            ],
-        )
+                staff_map.get(swap.get("approved_staff_id", ""), None),
+            )
+            for swap in seed_data["swap_requests"]
+        ],
+        columns=[
+            "swap_id", "shift_id", "original_staff_id", "original_staff_name", "day_offset",
+            "start_time", "end_time", "reason", "status", "approved_staff_id",
+            "approved_staff_name",
+        ],
+    )
+    conn.register("swaps_seed", swaps_df)
+    conn.execute("""
+        INSERT INTO swap_requests
+        SELECT swap_id, shift_id, original_staff_id, original_staff_name,
+               CURRENT_DATE + CAST(day_offset AS INTEGER),
+               start_time, end_time, reason, status,
+               NOW() + to_days(CAST(day_offset AS INTEGER)),
+               approved_staff_id, approved_staff_name, NULL
+        FROM swaps_seed
+    """)
+    conn.unregister("swaps_seed")
 
 
 # --- モジュールレベルのDB管理インスタンス ---
@@ -160,6 +198,41 @@ _db = DuckDBManager("shift_manager_seed.json", _init_schema)
 _load_seed_data = _db.load_seed_data
 _get_connection = _db.get_connection
 
+# staff テーブルの短期キャッシュ（列リスト -> (取得時刻, 行)）
+_STAFF_CACHE_TTL = 30.0
+_staff_cache: dict[str, tuple[float, list[tuple]]] = {}
+_staff_cache_conn: duckdb.DuckDBPyConnection | None = None
+
+
+def _invalidate_staff_cache() -> None:
+    """staff キャッシュを破棄する。データ変更SQLの実行後に呼ぶ。"""
+    _staff_cache.clear()
+
+
+def _get_staff_rows(conn: duckdb.DuckDBPyConnection, columns: str) -> list[tuple]:
+    """staff テーブルの指定列を短期キャッシュ付きで返す。
+
+    staff はほぼ静的なため、同一会話内の繰り返し呼び出しでは
+    DuckDBへの問い合わせを省略する。接続が作り直された場合は破棄する。
+
+    Args:
+        conn: shift_manager のDuckDB接続
+        columns: SELECT する列（例: "id, name, role"）
+    """
+    global _staff_cache_conn
+    if conn is not _staff_cache_conn:
+        _staff_cache.clear()
+        _staff_cache_conn = conn
+
+    now = time.monotonic()
+    cached = _staff_cache.get(columns)
+    if cached is not None and now - cached[0] < _STAFF_CACHE_TTL:
+        return cached[1]
+
+    rows = conn.execute(f"SELECT {columns} FROM staff").fetchall()
+    _staff_cache[columns] = (now, rows)
+    return rows
+
 
 class ShiftManagerTool(Tool):
     """SQL文でシフトデータを操作・分析するツール。"""
@@ -183,10 +256,27 @@ class ShiftManagerTool(Tool):
             )
             return
 
+        # 実行前にパースし、複数文の連結や共有DBのスキーマを壊すDDL等を弾く
+        try:
+            kind = classify_statement(sql)
+        except (ValueError, duckdb.Error) as e:
+            yield self.create_json_message({"error": str(e)})
+            return
+        if kind not in _ALLOWED_STATEMENT_KINDS:
+            yield self.create_json_message(
+                {
+                    "error": f"許可されていないSQL: {kind}",
+                    "hint": "SELECT / INSERT / UPDATE / DELETE のみ実行できます",
+                }
+            )
+            return
+
         try:
             conn = _db.get_connection()
-            result = conn.execute(sql).fetchdf()
-            yield self.create_json_message(result.to_dict(orient="records"))
+            records = fetch_records(conn, sql)
+            if kind not in READ_ONLY_STATEMENT_KINDS:
+                _invalidate_staff_cache()
+            yield self.create_json_message(records)
 
         except Exception as e:
             yield self.create_json_message({"error": str(e)})
@@ -7,13 +7,15 @@
 
 from collections.abc import Generator
 from datetime import datetime
+import json
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
-from tools.datetime_utils import JST, WEEKDAY_JA, WEEKDAY_KEYS
+from tools.datetime_utils import JST, WEEKDAY_JA, WEEKDAY_KEYS, parse_hour
 # shift_managerの接続を再利用
 from tools.shift_manager import _get_connection as _get_shift_connection
+from tools.shift_manager import _get_staff_rows
 
 # 時間帯別の必要人数（基本）
 BASE_STAFF_REQUIREMENTS = {
@@ -46,8 +48,6 @@ def _parse_availability(availability_json: str, weekday_key: str) -> list[tuple[
         availability_json: スタッフの出勤可能時間JSON文字列
         weekday_key: 曜日キー（例: "mon", "tue"）
     """
-    import json
-
     try:
         avail = json.loads(availability_json)
         slots = avail.get(weekday_key, [])
@@ -55,8 +55,8 @@ def _parse_availability(availability_json: str, weekday_key: str) -> list[tuple[
         for slot in slots:
             if "-" in slot:
                 start, end = slot.split("-")
-                start_h = int(start.split(":")[0])
-                end_h = int(end.split(":")[0])
+                start_h = parse_hour(start)
+                end_h = parse_hour(end)
                 if end_h < start_h:  # 深夜シフト (22:00-06:00)
                     end_h += 24
                 result.append((start_h, end_h))
@@ -65,22 +65,6 @@ def _parse_availability(availability_json: str, weekday_key: str) -> list[tuple[
         return []
 
 
-def _check_hour_coverage(start: int, end: int, hour: int) -> bool:
-    """指定時間がシフトでカバーされているか判定する。
-
-    深夜シフト（end > 24）の場合、早朝時間帯（hour < 6）を
-    24加算して比較する。
-
-    Args:
-        start: シフト開始時（0〜23）
-        end: シフト終了時（深夜跨ぎの場合24超）
-        hour: 判定対象の時間（0〜23）
-    """
-    if end > 24 and hour < 6:  # 深夜シフト
-        hour += 24
-    return start <= hour < end
-
-
 class ShiftOptimizerTool(Tool):
     """シフト最適化ツール。
 
@@ -114,10 +98,11 @@ class ShiftOptimizerTool(Tool):
             conn = _get_shift_connection()
 
             # スタッフ情報を取得
-            staff_result = conn.execute("""
-                SELECT id, name, role, hourly_rate, skills, availability
-                FROM staff
-            """).fetchall()
+            staff_result = _get_staff_rows(
+                conn,
+                "id, name, role, hourly_rate, "
+                "COALESCE(skills, CAST([] AS VARCHAR[])), availability",
+            )
 
             # 既存シフトを確認
             existing_shifts = conn.execute(
@@ -161,16 +146,15 @@ class ShiftOptimizerTool(Tool):
                 staff_id, name, role, hourly_rate, skills, availability = staff
                 avail_slots = _parse_availability(availability, weekday_key)
                 if avail_slots:
-                    skills_list = skills if isinstance(skills, list) else []
                     available_staff.append(
                         {
                             "id": staff_id,
                             "name": name,
                             "role": role,
                             "hourly_rate": hourly_rate,
-                            "skills": skills_list,
+                            "skills": skills,
                             "available_slots": avail_slots,
-                            "has_karaage_skill": "からあげ" in skills_list,
+                            "has_karaage_skill": "からあげ" in skills,
                             "is_manager": role == "manager",
                             "already_assigned": staff_id in existing_staff,
                         }
@@ -216,8 +200,10 @@ class ShiftOptimizerTool(Tool):
 
                 for start, end in staff["available_slots"]:
                     # ランチ・夕方ピークをカバーできるか
+                    # 深夜シフト（end > 24）では早朝時間帯（h < 6）を24加算して比較する
                     covers_peak = any(
-                        _check_hour_coverage(start, end, h) for h in peak_hours
+                        start <= (h + 24 if end > 24 and h < 6 else h) < end
+                        for h in peak_hours
                     )
 
                     if covers_peak or (
@@ -12,14 +12,82 @@ agentがoverridesで変更情報を渡すことで正しいシフト表を生成
 
 import json as _json
 from collections.abc import Generator
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
-from tools.datetime_utils import JST, WEEKDAY_JA
+from tools.datetime_utils import JST, WEEKDAY_JA, parse_hour
 from tools.shift_manager import _get_connection as _get_shift_connection
 
+# シフトの勤務時間（深夜跨ぎは+24）をDuckDB側で算出するSQL式
+# 時刻が "HH:MM" 形式でない行はエラーにせず 0 時間として扱う
+_SHIFT_HOURS_SQL = """
+    COALESCE(
+        TRY_CAST(split_part(end_time, ':', 1) AS INTEGER)
+        - TRY_CAST(split_part(start_time, ':', 1) AS INTEGER)
+        + CASE
+            WHEN TRY_CAST(split_part(end_time, ':', 1) AS INTEGER)
+                 < TRY_CAST(split_part(start_time, ':', 1) AS INTEGER)
+            THEN 24 ELSE 0
+          END,
+        0
+    )
+"""
+
+# skills（VARCHAR[]）のNULLを空リストに正規化するSQL式
+_SKILLS_SQL = "COALESCE(st.skills, CAST([] AS VARCHAR[]))"
+
+
+def _cancelled_clause(
+    cancelled_set: frozenset[tuple[str, date]], staff_col: str, date_col: str,
+) -> tuple[str, list]:
+    """overrides.cancelled のシフトをDuckDB側で除外するSQL条件とバインド値を返す。
+
+    Args:
+        cancelled_set: (staff_id, date) のセット
+        staff_col: スタッフIDの列名
+        date_col: 日付の列名
+    """
+    if not cancelled_set:
+        return "", []
+    placeholders = ", ".join(["(?, ?)"] * len(cancelled_set))
+    params = [v for pair in cancelled_set for v in pair]
+    return f"AND ({staff_col}, {date_col}) NOT IN (VALUES {placeholders})", params
+
+
+def _ymd(d: datetime) -> str:
+    """日付を "YYYY-MM-DD" 形式にする（date.isoformat のC実装を使い strftime より軽量）。"""
+    return d.date().isoformat()
+
+
+def _span_hours(start: str, end: str) -> int:
+    """"HH:MM" 形式の開始・終了時刻から勤務時間を返す（深夜跨ぎ対応）。"""
+    start_h = parse_hour(start)
+    end_h = parse_hour(end)
+    if end_h < start_h:
+        end_h += 24
+    return end_h - start_h
+
+
+def _build_date_info(
+    dates: list[datetime], date_strs: list[str], today_str: str, with_month: bool = False,
+) -> list[dict]:
+    """ヘッダー用の日付情報（曜日・土日・今日判定）を構築する。
+
+    曜日は日付ごとに1回だけ求め、週間ビュー・スタッフ別ビューで共用する。
+    """
+    date_info = []
+    for d, date_str in zip(dates, date_strs):
+        wd = d.weekday()
+        info = {"date": date_str, "weekday": WEEKDAY_JA[wd], "day": d.day}
+        if with_month:
+            info["month"] = d.month
+        info["is_weekend"] = wd >= 5
+        info["is_today"] = date_str == today_str
+        date_info.append(info)
+    return date_info
+
 
 def _parse_overrides(raw: str | dict | None) -> dict:
     """overridesパラメータをパースして正規化する。
@@ -98,13 +166,24 @@ class ShiftTableGeneratorTool(Tool):
             yield self.create_json_message({"error": str(e)})
 
     @staticmethod
-    def _build_cancelled_set(overrides: dict) -> set[tuple[str, str]]:
-        """overrides.cancelled から (staff_id, date) のセットを構築する。"""
-        return {
-            (c["staff_id"], c["date"])
-            for c in overrides.get("cancelled", [])
-            if "staff_id" in c and "date" in c
-        }
+    def _build_cancelled_set(overrides: dict) -> frozenset[tuple[str, date]]:
+        """overrides.cancelled から (staff_id, date) のセットを構築する。
+
+        日付はDuckDBのDATE列と同じ datetime.date に変換しておく。
+        YYYY-MM-DD 形式でない日付はDBの日付と一致し得ないため除外する。
+        """
+        cancelled = set()
+        for c in overrides.get("cancelled", []):
+            staff_id, date_str = c.get("staff_id"), c.get("date")
+            if not isinstance(staff_id, str) or not isinstance(date_str, str):
+                continue
+            try:
+                d = date.fromisoformat(date_str)
+            except ValueError:
+                continue
+            if d.isoformat() == date_str:
+                cancelled.add((staff_id, d))
+        return frozenset(cancelled)
 
     @staticmethod
     def _build_added_list(overrides: dict) -> list[dict]:
@@ -114,83 +193,103 @@ class ShiftTableGeneratorTool(Tool):
             if all(k in a for k in ("staff_id", "date", "start", "end"))
         ]
 
-    def _get_weekly_data(
-        self, base_date: datetime, now: datetime, overrides: dict | None = None,
-    ) -> dict:
-        """週間シフトデータを取得する。
+    def _prepare_overrides(self, overrides: dict | None) -> tuple[str, list, list[dict]]:
+        """overrides からSQL除外条件・バインド値・追加シフトを組み立てる。
 
-        指定された開始日から7日間のシフトデータを、
-        スタッフ×日付のマトリクス形式で返す。
+        overrides が空の場合（大半の呼び出し）はパース処理を丸ごと省略する。
+
+        Returns:
+            (cancelled_sql, cancelled_params, added_list)
+        """
+        if not overrides or not (overrides.get("cancelled") or overrides.get("added")):
+            return "", [], []
+        # overrides で cancelled 指定されたシフトはSQLで除外する
+        cancelled_sql, cancelled_params = _cancelled_clause(
+            self._build_cancelled_set(overrides), "s.staff_id", "s.date",
+        )
+        return cancelled_sql, cancelled_params, self._build_added_list(overrides)
+
+    def _fetch_staff_schedule(
+        self, date_strs: list[str], overrides: dict | None,
+    ) -> tuple[list[dict], dict[str, list[list[dict]]], dict[str, list[int]]]:
+        """スタッフ一覧と、スタッフ別・日付別のシフトと勤務時間を取得する。
+
+        週間ビューとスタッフ別ビューの共通処理。overrides を反映済みの
+        シフトと勤務時間を、date_strs と同じ並びの日付スロットのリストで返す。
 
         Args:
-            base_date: 週の開始日（月曜日）
-            now: 現在日時（今日判定に使用）
+            date_strs: 対象日付（"YYYY-MM-DD"）のリスト
             overrides: 会話中のシフト変更（cancelled / added）
+
+        Returns:
+            (staff_list, shifts_by_staff, hours_by_staff)
         """
-        overrides = overrides or {"cancelled": [], "added": []}
-        cancelled_set = self._build_cancelled_set(overrides)
-        added_list = self._build_added_list(overrides)
+        cancelled_sql, cancelled_params, added_list = self._prepare_overrides(overrides)
 
         conn = _get_shift_connection()
 
-        # 日付リスト（7日間）
-        dates = [base_date + timedelta(days=i) for i in range(7)]
-        date_strs = [d.strftime("%Y-%m-%d") for d in dates]
-        today_str = now.strftime("%Y-%m-%d")
-
-        # スタッフ一覧を取得
-        staff_rows = conn.execute("""
-            SELECT id, name, role, skills, hourly_rate
-            FROM staff
-            ORDER BY role DESC, name
-        """).fetchall()
-
-        staff_list = [
-            {
-                "id": row[0],
-                "name": row[1],
-                "role": row[2],
-                "skills": row[3] if isinstance(row[3], list) else [],
-                "hourly_rate": row[4],
-            }
-            for row in staff_rows
-        ]
-        staff_name_map = {s["id"]: s["name"] for s in staff_list}
-
-        # シフトデータを取得（キャンセル済みは除外）
-        shifts = conn.execute(
-            """
-            SELECT staff_id, date, start_time, end_time, status
-            FROM shifts
-            WHERE date >= ? AND date <= ? AND status != 'cancelled'
-            ORDER BY date, start_time
+        # スタッフ×シフトを1クエリで取得（キャンセル済みは除外）
+        rows = conn.execute(
+            f"""
+            SELECT st.id, st.name, st.role, {_SKILLS_SQL}, st.hourly_rate,
+                   date_diff('day', CAST(? AS DATE), s.date) AS day_idx,
+                   s.start_time, s.end_time, s.status,
+                   {_SHIFT_HOURS_SQL} AS hours
+            FROM staff st
+            LEFT JOIN shifts s
+              ON s.staff_id = st.id
+             AND s.date >= ? AND s.date <= ? AND s.status != 'cancelled'
+             {cancelled_sql}
+            ORDER BY st.role DESC, st.name, st.id, s.date, s.start_time
             """,
-            [date_strs[0], date_strs[-1]],
+            [date_strs[0], date_strs[0], date_strs[-1], *cancelled_params],
         ).fetchall()
 
-        # シフトをスタッフ×日付でマッピング
-        shift_map = {}
-        for shift in shifts:
-            staff_id, date, start, end, status = shift
-            date_str = str(date)
-            # overrides で cancelled 指定されたシフトを除外
-            if (staff_id, date_str) in cancelled_set:
+        # ソート済みの結果を1回走査し、スタッフ一覧とスタッフ別のシフトを構築する
+        # シフトと勤務時間は date_strs と同じ並びの日付スロットのリストで保持する
+        # 日付スロットの位置（day_idx）はDuckDB側で算出済み
+        date_index = {d: i for i, d in enumerate(date_strs)}
+        num_days = len(date_strs)
+        staff_list = []
+        shifts_by_staff = {}
+        hours_by_staff = {}
+        current_id = None
+        for row in rows:
+            staff_id, name, role, skills, hourly_rate, i, start, end, status, hours = row
+            if staff_id != current_id:
+                current_id = staff_id
+                staff_list.append({
+                    "id": staff_id,
+                    "name": name,
+                    "role": role,
+                    "skills": skills,
+                    "hourly_rate": hourly_rate,
+                })
+                day_shifts = [[] for _ in range(num_days)]
+                day_hours = [0] * num_days
+                shifts_by_staff[staff_id] = day_shifts
+                hours_by_staff[staff_id] = day_hours
+            if i is None:
                 continue
-            key = (staff_id, date_str)
-            if key not in shift_map:
-                shift_map[key] = []
-            shift_map[key].append(
-                {"start": start, "end": end, "status": status}
-            )
+            day_shifts[i].append({"start": start, "end": end, "status": status})
+            day_hours[i] += hours
+        staff_name_map = {s["id"]: s["name"] for s in staff_list}
 
         # overrides で追加されたシフトを反映
         for added in added_list:
-            key = (added["staff_id"], added["date"])
-            if key not in shift_map:
-                shift_map[key] = []
-            shift_map[key].append(
-                {"start": added["start"], "end": added["end"], "status": "confirmed"}
-            )
+            added_id = added["staff_id"]
+            if added_id not in shifts_by_staff:
+                shifts_by_staff[added_id] = [[] for _ in range(num_days)]
+                hours_by_staff[added_id] = [0] * num_days
+            i = date_index.get(added["date"])
+            if i is not None:
+                shifts_by_staff[added_id][i].append(
+                    {"start": added["start"], "end": added["end"], "status": "confirmed"}
+                )
+                try:
+                    hours_by_staff[added_id][i] += _span_hours(added["start"], added["end"])
+                except Exception:
+                    pass
             # 追加スタッフがスタッフ一覧に無ければ追加
             if added["staff_id"] not in staff_name_map:
                 new_staff = {
@@ -203,18 +302,31 @@ class ShiftTableGeneratorTool(Tool):
                 staff_list.append(new_staff)
                 staff_name_map[added["staff_id"]] = new_staff["name"]
 
-        # 日付情報を構築
-        date_info = []
-        for d in dates:
-            date_str = d.strftime("%Y-%m-%d")
-            date_info.append({
-                "date": date_str,
-                "weekday": WEEKDAY_JA[d.weekday()],
-                "day": d.day,
-                "month": d.month,
-                "is_weekend": d.weekday() >= 5,
-                "is_today": date_str == today_str,
-            })
+        return staff_list, shifts_by_staff, hours_by_staff
+
+    def _get_weekly_data(
+        self, base_date: datetime, now: datetime, overrides: dict | None = None,
+    ) -> dict:
+        """週間シフトデータを取得する。
+
+        指定された開始日から7日間のシフトデータを、
+        スタッフ×日付のマトリクス形式で返す。
+
+        Args:
+            base_date: 週の開始日（月曜日）
+            now: 現在日時（今日判定に使用）
+            overrides: 会話中のシフト変更（cancelled / added）
+        """
+        # 日付リスト（7日間）
+        dates = [base_date + timedelta(days=i) for i in range(7)]
+        date_strs = [_ymd(d) for d in dates]
+        today_str = _ymd(now)
+
+        staff_list, shifts_by_staff, hours_by_staff = self._fetch_staff_schedule(
+            date_strs, overrides,
+        )
+
+        date_info = _build_date_info(dates, date_strs, today_str, with_month=True)
 
         # スタッフごとのシフトを構築
         schedule = []
@@ -222,32 +334,19 @@ class ShiftTableGeneratorTool(Tool):
         total_hours = 0
 
         for staff in staff_list:
-            staff_schedule = {
+            sid = staff["id"]
+            day_shifts = shifts_by_staff[sid]
+            schedule.append({
                 "staff": staff,
-                "shifts_by_date": {},
-            }
-            for date_str in date_strs:
-                key = (staff["id"], date_str)
-                shift_list = shift_map.get(key, [])
-                staff_schedule["shifts_by_date"][date_str] = shift_list
-
-                for s in shift_list:
-                    total_shifts += 1
-                    try:
-                        start_h = int(s["start"].split(":")[0])
-                        end_h = int(s["end"].split(":")[0])
-                        if end_h < start_h:
-                            end_h += 24
-                        total_hours += end_h - start_h
-                    except Exception:
-                        pass
-
-            schedule.append(staff_schedule)
+                "shifts_by_date": dict(zip(date_strs, day_shifts)),
+            })
+            total_shifts += sum(map(len, day_shifts))
+            total_hours += sum(hours_by_staff[sid])
 
         return {
             "view_type": "weekly",
-            "start_date": base_date.strftime("%Y-%m-%d"),
-            "end_date": dates[-1].strftime("%Y-%m-%d"),
+            "start_date": date_strs[0],
+            "end_date": date_strs[-1],
             "generated_at": now.isoformat(),
             "dates": date_info,
             "schedule": schedule,
@@ -271,40 +370,35 @@ class ShiftTableGeneratorTool(Tool):
             now: 現在日時
             overrides: 会話中のシフト変更（cancelled / added）
         """
-        overrides = overrides or {"cancelled": [], "added": []}
-        cancelled_set = self._build_cancelled_set(overrides)
-        added_list = self._build_added_list(overrides)
+        cancelled_sql, cancelled_params, added_list = self._prepare_overrides(overrides)
 
         conn = _get_shift_connection()
 
-        date_str = base_date.strftime("%Y-%m-%d")
+        date_str = _ymd(base_date)
         weekday = WEEKDAY_JA[base_date.weekday()]
 
         # シフトデータを取得
         shifts = conn.execute(
-            """
+            f"""
             SELECT s.staff_id, s.start_time, s.end_time, s.status,
-                   st.name, st.role, st.skills
+                   st.name, st.role, {_SKILLS_SQL}
             FROM shifts s
             JOIN staff st ON s.staff_id = st.id
             WHERE s.date = ? AND s.status != 'cancelled'
+            {cancelled_sql}
             ORDER BY s.start_time, st.name
             """,
-            [date_str],
+            [date_str, *cancelled_params],
         ).fetchall()
 
         # 時間帯カバレッジ（6時〜24時）
-        hours = list(range(6, 24))
-        hourly_coverage = {h: [] for h in hours}
+        hourly_coverage = {h: [] for h in range(6, 24)}
 
         staff_shifts = []
         for shift in shifts:
             staff_id, start, end, status, name, role, skills = shift
-            # overrides で cancelled 指定されたシフトを除外
-            if (staff_id, date_str) in cancelled_set:
-                continue
-            start_h = int(start.split(":")[0])
-            end_h = int(end.split(":")[0])
+            start_h = parse_hour(start)
+            end_h = parse_hour(end)
             if end_h < start_h:
                 end_h += 24
 
@@ -312,24 +406,23 @@ class ShiftTableGeneratorTool(Tool):
                 "staff_id": staff_id,
                 "name": name,
                 "role": role,
-                "skills": skills if isinstance(skills, list) else [],
+                "skills": skills,
                 "start": start,
                 "end": end,
                 "status": status,
             }
             staff_shifts.append(shift_data)
 
-            # 時間帯カバレッジに追加
-            for h in hours:
-                if start_h <= h < end_h:
-                    hourly_coverage[h].append(name)
+            # 時間帯カバレッジに追加（6時〜24時の範囲内のみ走査）
+            for h in range(max(6, start_h), min(24, end_h)):
+                hourly_coverage[h].append(name)
 
         # overrides で追加されたシフトを反映（対象日のみ）
         for added in added_list:
             if added["date"] != date_str:
                 continue
-            start_h = int(added["start"].split(":")[0])
-            end_h = int(added["end"].split(":")[0])
+            start_h = parse_hour(added["start"])
+            end_h = parse_hour(added["end"])
             if end_h < start_h:
                 end_h += 24
             added_name = added.get("name", added["staff_id"])
@@ -343,9 +436,8 @@ class ShiftTableGeneratorTool(Tool):
                 "status": "confirmed",
             }
             staff_shifts.append(shift_data)
-            for h in hours:
-                if start_h <= h < end_h:
-                    hourly_coverage[h].append(added_name)
+            for h in range(max(6, start_h), min(24, end_h)):
+                hourly_coverage[h].append(added_name)
 
         return {
             "view_type": "daily",
@@ -371,123 +463,33 @@ class ShiftTableGeneratorTool(Tool):
             now: 現在日時（今日判定に使用）
             overrides: 会話中のシフト変更（cancelled / added）
         """
-        overrides = overrides or {"cancelled": [], "added": []}
-        cancelled_set = self._build_cancelled_set(overrides)
-        added_list = self._build_added_list(overrides)
-
-        conn = _get_shift_connection()
-
         # 2週間分
         dates = [base_date + timedelta(days=i) for i in range(14)]
-        date_strs = [d.strftime("%Y-%m-%d") for d in dates]
-        today_str = now.strftime("%Y-%m-%d")
-
-        # スタッフ一覧を取得
-        staff_rows = conn.execute("""
-            SELECT id, name, role, hourly_rate, skills
-            FROM staff
-            ORDER BY role DESC, name
-        """).fetchall()
-
-        staff_list = [
-            {
-                "id": row[0],
-                "name": row[1],
-                "role": row[2],
-                "hourly_rate": row[3],
-                "skills": row[4] if isinstance(row[4], list) else [],
-            }
-            for row in staff_rows
-        ]
-        staff_name_map = {s["id"]: s["name"] for s in staff_list}
+        date_strs = [_ymd(d) for d in dates]
+        today_str = _ymd(now)
 
-        # シフトデータを取得（キャンセル済みは除外）
-        shifts = conn.execute(
-            """
-            SELECT staff_id, date, start_time, end_time, status
-            FROM shifts
-            WHERE date >= ? AND date <= ? AND status != 'cancelled'
-            ORDER BY date, start_time
-            """,
-            [date_strs[0], date_strs[-1]],
-        ).fetchall()
+        staff_list, shifts_by_staff, hours_by_staff = self._fetch_staff_schedule(
+            date_strs, overrides,
+        )
 
-        # シフトをスタッフ×日付でマッピング
-        shift_map = {}
-        for shift in shifts:
-            staff_id, date, start, end, status = shift
-            date_str = str(date)
-            # overrides で cancelled 指定されたシフトを除外
-            if (staff_id, date_str) in cancelled_set:
-                continue
-            key = (staff_id, date_str)
-            if key not in shift_map:
-                shift_map[key] = []
-            shift_map[key].append({"start": start, "end": end, "status": status})
-
-        # overrides で追加されたシフトを反映
-        for added in added_list:
-            key = (added["staff_id"], added["date"])
-            if key not in shift_map:
-                shift_map[key] = []
-            shift_map[key].append(
-                {"start": added["start"], "end": added["end"], "status": "confirmed"}
-            )
-            if added["staff_id"] not in staff_name_map:
-                new_staff = {
-                    "id": added["staff_id"],
-                    "name": added.get("name", added["staff_id"]),
-                    "role": "part_time",
-                    "hourly_rate": 0,
-                    "skills": [],
-                }
-                staff_list.append(new_staff)
-                staff_name_map[added["staff_id"]] = new_staff["name"]
-
-        # 日付情報を構築
-        date_info = []
-        for d in dates:
-            date_str = d.strftime("%Y-%m-%d")
-            date_info.append({
-                "date": date_str,
-                "weekday": WEEKDAY_JA[d.weekday()],
-                "day": d.day,
-                "is_weekend": d.weekday() >= 5,
-                "is_today": date_str == today_str,
-            })
+        date_info = _build_date_info(dates, date_strs, today_str)
 
         # スタッフごとの集計
         staff_summary = []
         for staff in staff_list:
-            total_hours = 0
-            shifts_by_date = {}
-
-            for date_str in date_strs:
-                key = (staff["id"], date_str)
-                shift_list = shift_map.get(key, [])
-                shifts_by_date[date_str] = shift_list
-
-                for s in shift_list:
-                    try:
-                        start_h = int(s["start"].split(":")[0])
-                        end_h = int(s["end"].split(":")[0])
-                        if end_h < start_h:
-                            end_h += 24
-                        total_hours += end_h - start_h
-                    except Exception:
-                        pass
-
+            sid = staff["id"]
+            total_hours = sum(hours_by_staff[sid])
             staff_summary.append({
                 "staff": staff,
                 "total_hours": total_hours,
                 "estimated_pay": total_hours * (staff["hourly_rate"] or 0),
-                "shifts_by_date": shifts_by_date,
+                "shifts_by_date": dict(zip(date_strs, shifts_by_staff[sid])),
             })
 
         return {
             "view_type": "staff",
-            "start_date": base_date.strftime("%Y-%m-%d"),
-            "end_date": dates[-1].strftime("%Y-%m-%d"),
+            "start_date": date_strs[0],
+            "end_date": date_strs[-1],
             "generated_at": now.isoformat(),
             "dates": date_info,
             "staff_summary": staff_summary,